@@ -1,10 +1,20 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import json
 import logging
+import queue
 import random
-
-from datetime import datetime
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from os import replace as replace_file
 from os.path import exists as path_exists
 
 import discord
@@ -14,33 +24,145 @@ from decouple import config, UndefinedValueError
 from discord.ext import commands, tasks
 from spotipy.oauth2 import SpotifyOAuth
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 bot_token = config('HOOK_BOT_TOKEN')
 bot_log_file = config('HOOK_LOG_FILE', default='the_hook.log', cast=str)
 bot_prefix = config('HOOK_BOT_PREFIX', default='.', cast=str)
 bot_check_interval = config('HOOK_CHECK_INTERVAL', default=20.0, cast=float)
+bot_max_check_interval = config('HOOK_MAX_CHECK_INTERVAL', default=bot_check_interval * 8,
+                                cast=float)
+spotify_rate_limit = config('HOOK_RATE_LIMIT', default=10.0, cast=float)
 DEBUG = config('HOOK_DEBUG', default=False, cast=bool)
 REPORT_REMOVALS = config('HOOK_REPORT_REMOVALS', default=False, cast=bool)
+HEADLESS = config('HOOK_HEADLESS', default=False, cast=bool)
+PLAYLIST_NAME = config('HOOK_PLAYLIST_NAME', cast=str)
+PLAYLIST_ID_FILE = config('HOOK_PLAYLIST_ID_FILE', default='playlist-id.json', cast=str)
+TRACKS_FILE = config('HOOK_TRACKS_FILE', default='tracks.json', cast=str)
+SNAPSHOT_ID_FILE = config('HOOK_SNAPSHOT_ID_FILE', default='', cast=str)
+NOTIFIED_IDS_FILE = config('HOOK_NOTIFIED_IDS_FILE', default='notified-ids.txt', cast=str)
+UPDATE_CHANNEL_ID = config('HOOK_UPDATE_CHANNEL_ID', default=0, cast=int)
+UPDATE_CHANNEL_NAME = config('HOOK_UPDATE_CHANNEL', default='', cast=str)
+if not UPDATE_CHANNEL_ID and not UPDATE_CHANNEL_NAME:
+    raise UndefinedValueError('HOOK_UPDATE_CHANNEL or HOOK_UPDATE_CHANNEL_ID must be set')
+if spotify_rate_limit < 0:
+    raise ValueError('HOOK_RATE_LIMIT must be a positive number, or 0 for no limit')
+
+# Playlist fields used by this script. Requesting only these keeps Spotify from sending along the
+# first page of the playlist's tracks, which get_playlist_tracks() fetches separately anyway.
+PLAYLIST_FIELDS = 'id,name,snapshot_id,external_urls'
+# Playlist item fields read from Tracks. Full track objects include things like the list of
+# markets each track is available in, which make up most of the response and are never used.
+TRACK_FIELDS = ('total,items(added_at,added_by.id,'
+                'track(id,name,external_urls,artists(id,name),album(name,images,external_urls)))')
+# Maximum number of playlist track pages to request from Spotify at the same time
+PAGE_FETCH_WORKERS = 4
+
+# Maximum number of update messages to send to Discord at the same time
+MAX_CONCURRENT_SENDS = 5
+
+# Embed colors for added and removed Tracks: Spotify green, or some red-ish analogoue of its
+# purple-ish tetradic color
+COLOR_ADDED = discord.Color.from_rgb(30, 215, 96)
+COLOR_REMOVED = discord.Color.from_rgb(186, 30, 53)
+# Embed author lines for added (True) and removed (False) Tracks, formatted with the playlist name
+AUTHOR_TEMPLATES = {True: 'Song added to "{}"', False: 'Song removed from "{}"'}
 
 logger = logging.getLogger('the_hook')
 logger.setLevel(logging.INFO)  # TODO: Parameterize
 log_handler = RotatingFileHandler(filename=bot_log_file, encoding='utf-8', mode='a')
 log_handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(log_handler)
+# Log records are written to the file by a background thread so that logging from the event loop
+# never has to wait on disk I/O
+log_queue = queue.Queue()
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+logger.addHandler(QueueHandler(log_queue))
 
 intents = discord.Intents.default()
 intents.presences = False
 bot = commands.Bot(intents=intents, command_prefix=bot_prefix)
 
+
+class RateLimiter():
+    """Token bucket that spaces out requests made from any number of threads.
+
+    Up to :attr capacity: requests can be made back-to-back, after which requests are let through
+    at an average of :attr rate: per second.
+
+    :attr rate: Number of requests allowed per second
+    :type rate: float
+
+    :attr capacity: Number of requests that can be made in a burst
+    :type capacity: int
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request can be made without going over the rate limit."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            # Take the token now even if it hasn't refilled yet. The balance going negative
+            # reserves the next free slot for this caller, so waiting callers stay in order.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+
+        if wait:
+            time.sleep(wait)
+
+
+class RateLimitedSpotify(spotipy.Spotify):
+    """spotipy client that waits on a RateLimiter before every Spotify API request.
+
+    Staying under Spotify's rate limit is cheaper than running into it; spotipy handles 429
+    responses by sleeping for as long as the Retry-After header says, which can be many seconds.
+    Requests aren't limited if :param limiter: is None.
+    """
+
+    def __init__(self, *args, limiter: RateLimiter = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def _internal_call(self, method, url, payload, params):
+        if self.limiter:
+            self.limiter.acquire()
+        return super()._internal_call(method, url, payload, params)
+
+
 # FIXME: This needs to be tied to individual users eventually if this script is to become a real
 #        bot. It's global for now because only my account is used and the code is simpler this way.
-sp = spotipy.Spotify(
+sp = RateLimitedSpotify(
     auth_manager=SpotifyOAuth(
         scope=['playlist-read-private'],
-        open_browser=not config('HOOK_HEADLESS', default=False, cast=bool)
-    )
+        open_browser=not HEADLESS
+    ),
+    limiter=(RateLimiter(rate=spotify_rate_limit, capacity=max(1, int(spotify_rate_limit)))
+             if spotify_rate_limit else None),
 )
 
+if orjson:
+    # spotipy parses every response with response.json(), which uses the standard json module.
+    # orjson is several times faster at decoding the large playlist track responses. The hook is
+    # added to the session spotipy builds itself so that its retry configuration is kept.
+    def _orjson_response_hook(response, *args, **kwargs):
+        response.json = lambda **_: orjson.loads(response.content)
+        return response
+
+    sp._session.hooks['response'].append(_orjson_response_hook)
+
 
 def get_playlist_tracks(pl_id: str) -> [Track]:
     """Return a list of all the Tracks in the playlist with id :param pl_id:
@@ -50,16 +172,82 @@ def get_playlist_tracks(pl_id: str) -> [Track]:
     """
 
     limit = 100
-    offset = 0
-    track_obj = sp.playlist_tracks(pl_id, limit=limit, offset=offset)
-    tracks = [Track(t) for t in track_obj['items']]
+    track_obj = sp.playlist_tracks(pl_id, fields=TRACK_FIELDS, limit=limit, offset=0)
+    pages = [track_obj['items']]
+
+    # The first page says how many tracks there are, so the rest of the pages don't depend on each
+    # other and can be requested at the same time. map() returns them in offset order.
+    offsets = range(limit, track_obj['total'], limit)
+    with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as executor:
+        pages.extend(executor.map(
+            lambda offset: sp.playlist_tracks(pl_id, fields=TRACK_FIELDS, limit=limit,
+                                              offset=offset)['items'],
+            offsets,
+        ))
+
+    return [Track(t) for page in pages for t in page]
+
 
-    while len(tracks) < track_obj['total']:
-        offset += limit
-        track_obj = sp.playlist_tracks(pl_id, limit=limit, offset=offset)
-        tracks.extend([Track(t) for t in track_obj['items']])
+# Artist id -> genres. Filled in bulk by prefetch_artist_genres() and one at a time on cache misses
+_artist_genres_cache = {}
 
-    return tracks
+
+def _artist_genres(artist_id: str) -> tuple:
+    """Return the genres of the artist with id :param artist_id:, caching the result"""
+    # Embeds are built in worker threads while the cache can be cleared from the event loop, so
+    # return the local value rather than reading the cache again after storing it
+    genres = _artist_genres_cache.get(artist_id)
+    if genres is None:
+        genres = tuple(sp.artist(artist_id)['genres'])
+        _artist_genres_cache[artist_id] = genres
+
+    return genres
+
+
+def prefetch_artist_genres(artist_ids: [str]):
+    """Cache the genres for all of :param artist_ids: using as few API requests as possible.
+
+    The Spotify Get Several Artists endpoint accepts up to 50 ids per request, so this makes
+    ceil(n / 50) requests for n uncached artists instead of n.
+
+    :param artist_ids: Artist ids to look up. Ids that are already cached are skipped.
+    :type artist_ids: [str]
+    """
+    limit = 50
+    missing = list({aid for aid in artist_ids if aid not in _artist_genres_cache})
+    for offset in range(0, len(missing), limit):
+        for artist in sp.artists(missing[offset:offset + limit])['artists']:
+            if artist:
+                _artist_genres_cache[artist['id']] = tuple(artist['genres'])
+
+
+@lru_cache(maxsize=1024)
+def _user_icon(user_id: str) -> str:
+    """Return the profile picture URL of the user with id :param user_id:, caching the result
+
+    Users without a profile picture get discord.Embed.Empty, which leaves the embed icon blank.
+    """
+    images = sp.user(user_id).get('images')
+    return images[0]['url'] if images else discord.Embed.Empty
+
+
+def clear_spotify_caches():
+    """Forget all cached artist genres and user profile pictures so they're fetched again"""
+    _artist_genres_cache.clear()
+    _user_icon.cache_clear()
+
+
+def write_file_atomically(fname: str, data: str):
+    """Replace the contents of the file called :param fname: with :param data:
+
+    The data is written to a temporary file first and then moved over :param fname:, so a crash
+    part way through leaves the old contents in place instead of a truncated file.
+    """
+    tmp_fname = f'{fname}.tmp'
+    with open(tmp_fname, 'w', encoding='utf-8') as f:
+        f.write(data)
+
+    replace_file(tmp_fname, fname)
 
 
 def get_tracks_from_playlist_name(pl_name: str) -> [Track]:
@@ -75,49 +263,69 @@ def artists_and_title_list(tracks: [Track], limit: int = None) -> [str]:
     :type limit: int, optional
     :returns: List of '<artist name(s)> - <title>' strings for Tracks in :param track_list:
     """
-    lst = []
-    # TODO: Too many tr*k? variable names in this scope
-    for number, trk in enumerate([tr.track for tr in tracks]):
-        if limit and number >= limit:
-            break
+    # ', '-separated list of artist names, plus ' - ' and Track name
+    return [', '.join(a['name'] for a in track.artists) + f' - {track.name}'
+            for track in islice(tracks, limit or None)]
 
-        # ', '-separated list of artist names, minus the ending ', ', plus ' - ' and Track name
-        lst.append(''.join([f'{a["name"]}, ' for a in trk.artists])[:-2] + f' - {trk.name}')
 
-    return lst
+class Track():
+    """Container for Spotify Track objects to reduce the amount of identical sub-dict code around
 
+    :attr raw: The PlaylistTrackObject this Track was made from
+    :type raw: dict
 
-class Track():
-    """Container for Spotify Track objects to reduce the amount of identical sub-dict code around"""
+    :attr track: The Track's 'track' data
+    :type track: dict
+
+    :attr id: The Track's 'id' data
+    :type id: str
+
+    :attr artists: The Track's 'artists' data
+    :type artists: [dict]
+
+    :attr name: The Track's 'name' data
+    :type name: str
+
+    :attr album: The Track's 'album' data
+    :type album: dict
+    """
+
+    # Every Track in a playlist gets one of these, so skip the per-instance __dict__. The fields
+    # read for every Track (e.g. id when diffing playlists) are looked up once here instead of
+    # on every access.
+    __slots__ = ('raw', 'track', 'id', 'artists', 'name', 'album')
 
     def __init__(self, track: dict):
         self.raw = track
+        self.track = track['track']
+        # Consider changing this to `tid` instead
+        self.id = self.track['id']
+        self.artists = self.track['artists']
+        self.name = self.track['name']
+        self.album = self.track['album']
 
     @property
-    def track(self) -> dict:
-        """The Track's 'track' data"""
-        return self.raw['track']
+    def primary_artist_id(self) -> str:
+        """The id of the Track's first listed artist"""
+        return self.artists[0]['id']
 
     @property
-    def id(self) -> str:
-        """The Track's 'id' data"""
-        # Consider changing this to `tid` instead
-        return self.track['id']
+    def artists_markdown(self) -> str:
+        """The Track's artist names in bold, separated by commas"""
+        return ', '.join(f'**{a["name"]}**' for a in self.artists)
 
     @property
-    def artists(self) -> [dict]:
-        """The Track's 'artists' data"""
-        return self.track['artists']
+    def added_at(self) -> datetime:
+        """When the Track was added to the playlist, in UTC
 
-    @property
-    def name(self) -> str:
-        """The Track's 'name' data"""
-        return self.track['name']
+        Spotify doesn't know when some very old playlist entries were added. Those get
+        discord.Embed.Empty, which Embeds accept as "no timestamp" (unlike None).
+        """
+        if not self.raw['added_at']:
+            return discord.Embed.Empty
 
-    @property
-    def album(self) -> [dict]:
-        """The Track's 'album' data"""
-        return self.track['album']
+        # [:-1] to remove the 'Z', which fromisoformat() doesn't accept before Python 3.11
+        return datetime.fromisoformat(self.raw['added_at'][:-1]).replace(tzinfo=timezone.utc)
 
 
 class Playlist():
@@ -134,9 +342,9 @@ class Playlist():
     """
 
     # TODO: Add a way to make this given the pl name instead of needing to use a separate function?
-    def __init__(self, pl: dict):
+    def __init__(self, pl: dict, tracks: [Track] = None):
         self.data = pl
-        self.tracks = get_playlist_tracks(pl['id'])
+        self.tracks = tracks if tracks is not None else get_playlist_tracks(pl['id'])
 
     @staticmethod
     def _playlist_from_search(name: str) -> dict:
@@ -154,20 +362,42 @@ class Playlist():
 
         return playlist
 
+    @staticmethod
+    def _playlist_from_user_playlists(name: str) -> dict:
+        """Return the dict for the current user's playlist called :param name:, or None.
+
+        The current user's playlists are listed 50 at a time, which is usually a single request
+        that is smaller and less heavily rate limited than a search.
+        """
+        limit = 50
+        offset = 0
+        while True:
+            page = sp.current_user_playlists(limit=limit, offset=offset)
+            for playlist in page['items']:
+                if playlist['name'] == name:
+                    return playlist
+
+            if not page['next']:
+                return None
+
+            offset += limit
+
     @classmethod
     def from_name(cls, name: str) -> Playlist:
-        """Search for a playlist called :param name: and return a Playlist object for it.
+        """Find a playlist called :param name: and return a Playlist object for it.
 
-        A substring match will be used to search for :param name: because of how the Spotify API
-        works. An input of "roadhouse blues" can return a playlist called "my roadhouse blues," but
-        not one called "roadhouse of the blues."
+        The current user's own and followed playlists are checked for an exact match first. If
+        there isn't one, a substring match will be used to search for :param name: because of how
+        the Spotify API works. An input of "roadhouse blues" can return a playlist called "my
+        roadhouse blues," but not one called "roadhouse of the blues."
         """
-        return Playlist(cls._playlist_from_search(name))
+        playlist = cls._playlist_from_user_playlists(name) or cls._playlist_from_search(name)
+        return Playlist(playlist)
 
     @classmethod
     def from_id(cls, plid: str) -> Playlist:
         """Get the playlist with id :param plid: and return a Playlist object for it."""
-        playlist = sp.playlist(plid)
+        playlist = sp.playlist(plid, fields=PLAYLIST_FIELDS)
         if not playlist:
             logger.critical('Spotify search for playlist with id %s failed', plid)
             raise KeyError(f'Could not find a playlist with id "{plid}"')
@@ -185,6 +415,15 @@ class Playlist():
         """Return the Playlist's 'snapshot_id' data"""
         return self.data['snapshot_id']
 
+    @cached_property
+    def by_id(self) -> dict:
+        """Return the Playlist's Tracks keyed by Track id, in playlist order.
+
+        This is built the first time it's used. A Playlist's Tracks don't change after it's
+        created, since a new Playlist is made for every new snapshot.
+        """
+        return {t.id: t for t in self.tracks}
+
     def artists_and_title_list(self, limit: int = None) -> [str]:
         return artists_and_title_list(self.tracks, limit)
 
@@ -194,16 +433,22 @@ class Playlist():
         :param other_pl: Another Playlist object with Tracks to compare.
                          Can be the same Playlist with a different Snapshot id.
         :type other_pl: Playlist
-        :returns: A tuple with unique Tracks from (self.playlist, other_pl)
+        :returns: A (removed, added) tuple: Tracks only in this Playlist, and Tracks only in
+            :param other_pl:. If :param other_pl: is a newer version of this Playlist, these are
+            the Tracks that were removed from and added to it, respectively.
         """
-        # Runtime complexity can absolutely be improved here
-        self_td = {t.id: t for t in self.tracks}
-        other_tracks = [t for t in other_pl.tracks if t.id not in self_td]
+        # The set difference of the id indexes finds the changed ids. The indexes (rather than the
+        # sets) are iterated to keep the differences in playlist order, but only when there is
+        # something to report.
+        self_tracks = self.by_id
+        other_tracks = other_pl.by_id
+        removed_ids = self_tracks.keys() - other_tracks.keys()
+        added_ids = other_tracks.keys() - self_tracks.keys()
 
-        other_td = {t.id: t for t in other_pl.tracks}
-        self_tracks = [self_td[tid] for tid in self_td if tid not in other_td]
+        removed = [t for tid, t in self_tracks.items() if tid in removed_ids] if removed_ids else []
+        added = [t for tid, t in other_tracks.items() if tid in added_ids] if added_ids else []
 
-        return (self_tracks, other_tracks)
+        return (removed, added)
 
 
 class HookBot(commands.Cog):
@@ -218,6 +463,10 @@ class HookBot(commands.Cog):
     :attr pl: Playlist object for :attr pl_name:
     :type pl: Playlist
 
+    :attr pl_id_fname: Name of the file to which the id of the playlist called :attr pl_name:
+        is saved, so that it doesn't have to be searched for on startup
+    :type pl_id_fname: str
+
     :attr snap_id_fname: Name of the shapshot id file
     :type snap_id_fname: str
 
@@ -226,49 +475,105 @@ class HookBot(commands.Cog):
         queried for updates to when the updates have been posted to the channel.
     :type snap_id: str
 
+    :attr tracks_fname: Name of the file to which :attr pl: and its Tracks are saved along with
+        :attr snap_id:, to find changes made while the bot wasn't running
+    :type tracks_fname: str
+
+    :attr notified_ids_fname: Name of the file to which :attr notified_ids: is saved
+    :type notified_ids_fname: str
+
+    :attr notified_ids: Keys of the added ('+<id>') and removed ('-<id>') Tracks already posted
+        about since :attr snap_id: was saved, so an update interrupted by a restart isn't posted
+        twice
+    :type notified_ids: set
+
+    :attr update_channel_name: Name of the Discord Channel for playlist update messages. Only
+        used to find the channel if HOOK_UPDATE_CHANNEL_ID isn't set.
+    :type update_channel_name: str
+
     :attr update_channel: The Discord Channel to which playlist update messages should be sent
     :type update_channel: discord.channel.TextChannel
     """
 
     def __init__(self, bot):
         self.bot = bot
-        self.pl_name: str = config('HOOK_PLAYLIST_NAME', cast=str)
+        self.pl_name: str = PLAYLIST_NAME
         self.pl: Playlist = None
+        self.update_channel_name: str = UPDATE_CHANNEL_NAME
         self.update_channel = None
-        self.snap_id_fname: str = 'snapshot-id.txt'
+        self._update_channel_id: int = UPDATE_CHANNEL_ID or None
+        self.pl_id_fname: str = PLAYLIST_ID_FILE
+        self.snap_id_fname: str = SNAPSHOT_ID_FILE or 'snapshot-id.txt'
         self.snap_id: str = ''
+        self.tracks_fname: str = TRACKS_FILE
+        self.notified_ids_fname: str = NOTIFIED_IDS_FILE
+        self.notified_ids: set = set()
 
-        try:
-            self.snap_id_fname = config('HOOK_SNAPSHOT_ID_FILE', cast=str)
-        except UndefinedValueError:
+        if not SNAPSHOT_ID_FILE:
             logger.warning(
                 'The snapshot id file variable, HOOK_SNAPSHOT_ID_FILE, was not set. Using "%s".',
                 self.snap_id_fname)
 
-        if not self._set_playlist():
-            logger.critical('Failed to get the "%s" playlist from Spotify.', self.pl_name)
-            raise Exception('Failed to get playlist from Spotify')
-
-        # Set :attr snap_id: to the known snapshot_id, or create the :attr snap_id_fname: file if it
-        # doesn't exist/this is the first run
-        if not self._load_snapshot_id():
-            self._update_snapshot_id()
+        # Set :attr snap_id: to the known snapshot_id. If the playlist was saved along with it, the
+        # first check will compare that to the current playlist and report any changes made while
+        # the bot was offline. Otherwise, start from the current playlist.
+        self._load_snapshot_id()
+        if not self._load_saved_playlist():
+            if not self._set_playlist():
+                logger.critical('Failed to get the "%s" playlist from Spotify.', self.pl_name)
+                raise Exception('Failed to get playlist from Spotify')
+
+            logger.info('No saved tracks for snapshot id "%s"; saving the current playlist',
+                        self.snap_id)
+            self.snap_id = self.pl.snapshot_id
+            self._save_snapshot_id()
 
+        self._load_notified_ids()
         self.check_for_updates.start()
+        self.expire_spotify_caches.start()
+
+    def _get_playlist(self, search: bool = False) -> Playlist:
+        """Get a Playlist object for the watched playlist.
+
+        self.pl.id is used if available, then the id saved in :attr pl_id_fname:, and
+        self.pl_name otherwise. Searching by name is the slowest way to find the playlist, so the
+        id of a playlist found that way is saved for next time.
+
+        :param search: Ignore the known ids and search for the playlist by name
+        :type search: bool, optional
+        """
+        plid = None
+        if not search:
+            plid = self.pl.id if self.pl and self.pl.id else self._load_playlist_id()
 
-    def _get_playlist(self) -> Playlist:
-        """Get a Playlist object using self.pl.id if available and self.pl_name otherwise."""
         try:
-            if self.pl and self.pl.id:
-                playlist = Playlist.from_id(self.pl.id)
+            if plid:
+                playlist = Playlist.from_id(plid)
             else:
                 playlist = Playlist.from_name(self.pl_name)
+                self._save_playlist_id(playlist)
+        except spotipy.SpotifyException:
+            if plid and not self.pl:
+                # The saved id is stale, e.g. the playlist was deleted and recreated
+                logger.warning('_get_playlist: Saved playlist id %s not found; searching', plid)
+                return self._get_playlist(search=True)
+
+            logger.critical('_get_playlist: Failed to get playlist from Spotify')
+            return None
         except KeyError:
             logger.critical('_get_playlist: Failed to get playlist from Spotify')
             return None
 
         return playlist
 
+    def _get_snapshot_id(self) -> str:
+        """Return the current snapshot_id of :attr pl: without fetching the rest of the playlist.
+
+        The full playlist response includes tracks and other data that isn't needed just to tell
+        whether the playlist has changed, so only the snapshot_id field is requested.
+        """
+        return sp.playlist(self.pl.id, fields='snapshot_id')['snapshot_id']
+
     def _set_playlist(self, playlist: Playlist = None) -> bool:
         """Get the playlist from Spotify and set self.pl to it.
 
@@ -289,6 +594,23 @@ class HookBot(commands.Cog):
         self.pl = playlist
         return True
 
+    def _load_playlist_id(self) -> str:
+        """Return the playlist id saved in :attr pl_id_fname:, or None if there isn't one.
+
+        The saved id is ignored if it was saved for a playlist name other than :attr pl_name:.
+        """
+        if not path_exists(self.pl_id_fname):
+            return None
+
+        with open(self.pl_id_fname, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+
+        return saved['id'] if saved.get('name') == self.pl_name else None
+
+    def _save_playlist_id(self, playlist: Playlist):
+        write_file_atomically(self.pl_id_fname,
+                              json.dumps({'name': self.pl_name, 'id': playlist.id}))
+
     def _load_snapshot_id(self):
         """Sets :attr self.snap_id: to the watched Playlist's snapshot_id.
 
@@ -302,28 +624,90 @@ class HookBot(commands.Cog):
 
         return False
 
+    def _load_saved_playlist(self) -> bool:
+        """Set :attr pl: to the Playlist saved in :attr tracks_fname:, without calling Spotify.
+
+        The saved Playlist is only used if it's the one saved for :attr pl_name: and its snapshot
+        id is :attr snap_id:.
+
+        :returns: True if :attr pl: was set; False otherwise
+        :rtype bool:
+        """
+        if not self.snap_id or not path_exists(self.tracks_fname):
+            return False
+
+        with open(self.tracks_fname, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+
+        if (saved['playlist']['id'] != self._load_playlist_id()
+                or saved['playlist']['snapshot_id'] != self.snap_id):
+            return False
+
+        logger.info('Loaded %d saved tracks for snapshot id "%s"',
+                    len(saved['tracks']), self.snap_id)
+        self.pl = Playlist(saved['playlist'], tracks=[Track(t) for t in saved['tracks']])
+        return True
+
     def _save_snapshot_id(self):
-        with open(self.snap_id_fname, 'w', encoding='utf-8') as f:
-            f.write(self.pl.snapshot_id)
+        """Save the snapshot id of :attr pl: and the Playlist itself.
+
+        The Playlist's Tracks are saved to :attr tracks_fname: so that changes made while the bot
+        isn't running can be found after it restarts.
+        """
+        # The tracks are written first. If the bot stops between the two writes, the old snapshot id
+        # won't match the saved tracks, so the next start fetches the playlist instead of using them
+        write_file_atomically(
+            self.tracks_fname,
+            json.dumps({'playlist': self.pl.data, 'tracks': [t.raw for t in self.pl.tracks]}),
+        )
+        write_file_atomically(self.snap_id_fname, self.pl.snapshot_id)
+        # Everything posted so far is part of the new snapshot, so start a new notified ids file
+        self._reset_notified_ids(self.pl.snapshot_id)
+
+    def _load_notified_ids(self):
+        """Set :attr notified_ids: to the keys saved in :attr notified_ids_fname:
+
+        The first line of the file is the snapshot id the notifications were sent for. Keys saved
+        for any other snapshot are out of date, so the file is started over instead.
+        """
+        lines = []
+        if path_exists(self.notified_ids_fname):
+            with open(self.notified_ids_fname, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+
+        if not lines or lines[0] != self.snap_id:
+            self._reset_notified_ids(self.snap_id)
+            return
+
+        self.notified_ids = set(lines[1:])
+        if self.notified_ids:
+            logger.info('%d updates for snapshot id "%s" were already posted',
+                        len(self.notified_ids), self.snap_id)
+
+    def _reset_notified_ids(self, snap_id: str):
+        """Forget all notified ids and start :attr notified_ids_fname: over for :param snap_id:"""
+        self.notified_ids = set()
+        write_file_atomically(self.notified_ids_fname, f'{snap_id}\n')
+
+    def _save_notified_id(self, key: str):
+        """Add :param key: to :attr notified_ids: and append it to :attr notified_ids_fname:"""
+        self.notified_ids.add(key)
+        with open(self.notified_ids_fname, 'a', encoding='utf-8') as f:
+            f.write(f'{key}\n')
 
     def _update_snapshot_id(self) -> bool:
         """Compare :attr snap_id: to the snapshot id of :attr pl: and update the former if needed.
 
-        This will also save the snap_id to the file, but that might need to change when a database
-        is added.
+        When the snapshot id is new, :attr pl: is saved through _save_snapshot_id(): the snapshot id
+        goes to :attr snap_id_fname:, the Playlist and its Tracks to :attr tracks_fname:, and
+        :attr notified_ids: and :attr notified_ids_fname: are started over for the new snapshot.
 
-        This does not affect the :attr pl: attribute or any attribute besides :attr snap_id:.
+        This does not change :attr pl:. HookBot.__init__ always sets :attr snap_id:, so there is no
+        first-run case to handle here.
 
         :returns: True if the snapshot id is new; False otherwise
         :rtype bool:
         """
-
-        if not self.snap_id:
-            # First time running this script or using this snapshot id file. Save the id and return
-            logger.info('Saving snapshot id to %s - new file or first run', self.snap_id_fname)
-            self._save_snapshot_id()
-            return True
-
         if self.snap_id != self.pl.snapshot_id:
             logger.info('_update_snapshot_id: Snap ids do not match')
             self.snap_id = self.pl.snapshot_id
@@ -342,38 +726,63 @@ class HookBot(commands.Cog):
             Embeds for added (new) and removed (not new) tracks contain different information.
         :type new: bool, optional
         """
-        # TODO: There are two API calls in this function. See if they can be made redundant
-        artists = ''.join([f'**{a["name"]}**, ' for a in track.artists])[:-2]
-        # Spotify green, or some red-ish analogoue of its purple-ish tetradic color
-        color = discord.Color.from_rgb(30, 215, 96) if new else discord.Color.from_rgb(186, 30, 53)
-        genres = sp.artist(track.artists[0]['id'])['genres']
+        color = COLOR_ADDED if new else COLOR_REMOVED
+        # Genres are only shown for new Tracks, so don't look them up for removed ones
+        genres = _artist_genres(track.primary_artist_id) if new and track.artists else ()
         pl_name = pl_name or self.pl_name
+        album = track.album
+        # Local files and some podcast episodes have no album art
+        images = album.get('images')
+        thumbnail_url = images[0]['url'] if images else discord.Embed.Empty
 
         embed = discord.embeds.Embed(
             title=track.name,
             type='rich',
-            description=f'{artists} • *{track.album["name"]}*',
-            url=track.album['external_urls']['spotify'],
-            timestamp=datetime.fromisoformat(track.raw['added_at'][:-1]),  # [:-1] to remove 'Z'ms
+            description=f'{track.artists_markdown} • *{album["name"]}*',
+            url=album['external_urls'].get('spotify', discord.Embed.Empty),
+            timestamp=track.added_at,
             color=color,
         ).set_thumbnail(
-            url=track.album['images'][0]['url'],
+            url=thumbnail_url,
         ).set_author(
             # TODO: add "by {user}" (if new?) in case there's no pfp or it's not obvious who did it
-            name=f'Song {"added to" if new else "removed from"} "{pl_name}"',
-            url=track.raw['track']['external_urls']['spotify'],
+            name=AUTHOR_TEMPLATES[new].format(pl_name),
+            url=track.track['external_urls'].get('spotify', discord.Embed.Empty),
             icon_url=(discord.Embed.Empty if not new
-                      else sp.user(track.raw['added_by']['id'])['images'][0]['url']),
+                      else _user_icon(track.raw['added_by']['id'])),
         )
 
-        if new and genres:
+        if genres:
+            # Only pick a random handful when there are too many genres to show them all
             embed.add_field(
                 name='Artist Genres',
-                value=' • '.join(random.sample(genres, min(4, len(genres)))),
+                value=' • '.join(genres if len(genres) <= 4 else random.sample(genres, 4)),
             )
 
         return embed
 
+    async def _send_embeds(self, embeds: dict):
+        """Send each of :param embeds: to :attr update_channel: in its own message.
+
+        Messages are independent of each other, so they're sent concurrently rather than waiting
+        for each one to be posted before starting the next. At most MAX_CONCURRENT_SENDS are in
+        flight at once to stay within Discord's per-channel rate limit.
+
+        :param embeds: Embeds to send, keyed by the :attr notified_ids: key to save once each one
+            has been posted
+        :type embeds: {str: discord.embeds.Embed}
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_SENDS)
+
+        async def send(key, embed):
+            async with semaphore:
+                await self.update_channel.send(embed=embed)
+
+            # A single short line, so it's appended right away rather than from a worker thread
+            self._save_notified_id(key)
+
+        await asyncio.gather(*(send(k, e) for k, e in embeds.items()))
+
     @commands.command(
         name='embed',
         brief='Post the most recent playlist addition to the update channel',
@@ -387,10 +796,12 @@ class HookBot(commands.Cog):
         """,
     )
     async def embed_track(self, ctx, track_offset: int =-1):
-        if track_offset < -len(self.pl.tracks) or track_offset >= len(self.pl.tracks):
+        tracks = self.pl.tracks
+        if not -len(tracks) <= track_offset < len(tracks):
             track_offset = -1
 
-        await ctx.send(embed=self._embed_from_track(self.pl.tracks[track_offset]))
+        embed = await asyncio.to_thread(self._embed_from_track, tracks[track_offset])
+        await ctx.send(embed=embed)
 
     @commands.command(
         name='playlist',
@@ -401,14 +812,45 @@ class HookBot(commands.Cog):
     async def playlist(self, ctx):
         await ctx.send(self.pl.data['external_urls']['spotify'])
 
+    @commands.command(
+        name='refresh',
+        brief='Search Spotify for the watched playlist again (bot owner only)',
+        help="""Search Spotify for the watched playlist again.
+
+        The bot remembers the playlist it found by name between restarts. Use this if the
+        playlist was deleted and recreated, or if the wrong playlist was found, to search for it
+        by name again. If a different playlist is found the bot starts watching it instead; changes
+        to the old playlist since the last check are not reported.
+
+        Only the bot's owner can use this command, since it searches for and fetches the whole
+        playlist again and can change which playlist is watched.
+        """,
+    )
+    @commands.is_owner()
+    async def refresh(self, ctx):
+        async with ctx.typing():
+            playlist = await asyncio.to_thread(self._get_playlist, search=True)
+
+        if not playlist:
+            await ctx.send(f'Could not find a playlist called "{self.pl_name}".')
+            return
+
+        if playlist.id != self.pl.id:
+            logger.info('refresh: Now watching playlist %s', playlist.id)
+            self._set_playlist(playlist)
+            await asyncio.to_thread(self._update_snapshot_id)
+
+        await ctx.send(playlist.data['external_urls']['spotify'])
+
     @commands.command(
         name='check',
         aliases=['c'],
         brief='Check the watched playlist for updates',
         help=f"""Check the watched playlist for updates.
 
-        Normally the bot checks for updates to the playlist every {bot_check_interval} minutes. This
-        command tells it to check for updates immediately.
+        Normally the bot checks for updates to the playlist every {bot_check_interval} minutes, or
+        less often (up to every {bot_max_check_interval} minutes) while the playlist isn't changing.
+        This command tells it to check for updates immediately.
 
         The bot will send a message to the update channel before it starts its check. After the
         check is complete it will react to that message with a green and white checkmark emote.
@@ -417,10 +859,29 @@ class HookBot(commands.Cog):
     async def check(self, ctx):
         async with ctx.typing():
             msg = await ctx.send('Checking for updates...')
-            await self.check_for_updates()
+            await self._check_for_updates()
 
         await msg.add_reaction('\N{WHITE HEAVY CHECK MARK}')
 
+    @commands.command(
+        name='clearcache',
+        brief='Forget cached Spotify artist and user data (bot owner only)',
+        help="""Forget cached Spotify artist and user data.
+
+        Artist genres and user profile pictures shown in update messages are cached, and the cache
+        is cleared every hour. This command clears it immediately so that recent changes on
+        Spotify show up in the next update message.
+
+        Only the bot's owner can use this command, since every cleared entry costs another Spotify
+        request to look up again.
+        """,
+    )
+    @commands.is_owner()
+    async def clear_cache(self, ctx):
+        clear_spotify_caches()
+        logger.info('Cleared cached Spotify artist and user data')
+        await ctx.message.add_reaction('\N{WHITE HEAVY CHECK MARK}')
+
     @commands.command(
         name='pdb',
         hidden=True,
@@ -434,31 +895,93 @@ class HookBot(commands.Cog):
 
     @tasks.loop(minutes=bot_check_interval)
     async def check_for_updates(self):
-        """Check for and notify about playlist updates once every 20 minutes."""
+        """Check for and notify about playlist updates.
+
+        Checks run every bot_check_interval minutes. Each check that finds no changes doubles the
+        time until the next one, up to bot_max_check_interval minutes, and a change goes back to
+        checking every bot_check_interval minutes.
+        """
+        if not await self._check_for_updates():
+            # Only scheduled checks back off, so using the 'check' command doesn't slow them down
+            self._set_check_interval(self.check_for_updates.minutes * 2)
+
+    async def _check_for_updates(self) -> bool:
+        """Check for and notify about playlist updates once.
+
+        :returns: False if the playlist hasn't changed since the last check; True otherwise
+        :rtype bool:
+        """
         logger.info('Checking for updates to "%s"', self.pl_name)
-        playlist = self._get_playlist()
-        # Note that this doesn't report changes made to the playlist while the bot wasn't running.
-        if playlist.snapshot_id != self.snap_id:
-            # Snapshot ids differ. Need to send updates and then save the new pl
-            logger.info('check_for_updates: snapshot ids differ')
+        # Most checks find no changes, so compare snapshot ids before fetching the full playlist.
+        # Like every spotipy request made here, the probe runs in a worker thread to keep the event
+        # loop (and the Discord gateway heartbeat) responsive while waiting on Spotify.
+        if await asyncio.to_thread(self._get_snapshot_id) == self.snap_id:
+            logger.info('check_for_updates: No difference in snapshot ids.')
+            return False
 
-            removed_tracks, new_tracks = self.pl.get_differences(playlist)
-            if REPORT_REMOVALS:
-                for track in removed_tracks:
-                    await self.update_channel.send(embed=self._embed_from_track(track, new=False))
+        # Snapshot ids differ. Need to send updates and then save the new pl
+        logger.info('check_for_updates: snapshot ids differ')
+        self._set_check_interval(bot_check_interval)
+        playlist = await asyncio.to_thread(self._get_playlist)
+        if not playlist:
+            return True
 
-            for track in new_tracks:
-                await self.update_channel.send(embed=self._embed_from_track(track))
+        removed_tracks, new_tracks = self.pl.get_differences(playlist)
+        # Skip anything already posted before a restart interrupted an earlier check
+        removed_tracks = [t for t in removed_tracks
+                          if REPORT_REMOVALS and f'-{t.id}' not in self.notified_ids]
+        new_tracks = [t for t in new_tracks if f'+{t.id}' not in self.notified_ids]
+        artist_ids = [t.primary_artist_id for t in new_tracks if t.artists]
+        await asyncio.to_thread(prefetch_artist_genres, artist_ids)
+        # Building an embed can mean waiting on Spotify for artist and user data, so build them
+        # all at once in worker threads. gather() returns them in the order the tracks were given.
+        embeds = await asyncio.gather(
+            *(asyncio.to_thread(self._embed_from_track, track, new=False)
+              for track in removed_tracks),
+            *(asyncio.to_thread(self._embed_from_track, track) for track in new_tracks),
+        )
+        keys = [f'-{t.id}' for t in removed_tracks] + [f'+{t.id}' for t in new_tracks]
+        await self._send_embeds(dict(zip(keys, embeds)))
 
-            self._set_playlist(playlist)
-            self._update_snapshot_id()
+        self._set_playlist(playlist)
+        await asyncio.to_thread(self._update_snapshot_id)
+        return True
+
+    def _set_check_interval(self, minutes: float):
+        """Check for updates every :param minutes: minutes, between the configured limits.
+
+        The new interval takes effect after the next check is scheduled.
+        """
+        minutes = max(bot_check_interval, min(minutes, bot_max_check_interval))
+        if minutes != self.check_for_updates.minutes:
+            logger.info('Checking for updates every %.1f minutes', minutes)
+            self.check_for_updates.change_interval(minutes=minutes)
 
     @check_for_updates.before_loop
     async def before_bot_ready(self):
         # Need to wait until the bot is running to get the Channel info
         await self.bot.wait_until_ready()
-        self.update_channel = [c for c in self.bot.get_all_channels()
-                               if c.name == config('HOOK_UPDATE_CHANNEL')][0]
+        if self._update_channel_id:
+            # The channel id is either configured or was found on an earlier run of this hook, so
+            # skip the search through every channel
+            self.update_channel = self.bot.get_channel(self._update_channel_id)
+
+        if not self.update_channel:
+            self.update_channel = discord.utils.get(self.bot.get_all_channels(),
+                                                    name=self.update_channel_name)
+
+        if not self.update_channel:
+            logger.critical('Could not find the update channel (id: %s, name: "%s")',
+                            self._update_channel_id, self.update_channel_name)
+            raise Exception('Failed to find the update channel')
+
+        self._update_channel_id = self.update_channel.id
+
+    @tasks.loop(hours=1)
+    async def expire_spotify_caches(self):
+        """Clear the artist and user caches every hour so changed genres and pictures are seen."""
+        logger.info('Clearing cached Spotify artist and user data')
+        clear_spotify_caches()
 
 
 @bot.event